@@ -1,45 +1,321 @@
 import logging
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Set
+from functools import lru_cache
+from itertools import chain, islice
+from math import gcd, isqrt, prod
+
+# The 8 residues modulo 30 that are coprime to 30: every prime above 5 has one of them.
+_WHEEL_RESIDUES = (1, 7, 11, 13, 17, 19, 23, 29)
+_RES_TO_BIT = {r: i for i, r in enumerate(_WHEEL_RESIDUES)}
+# For each possible byte of the wheel bitmap, the residues whose bits are set.
+_BIT_POSITIONS = tuple(tuple(r for i, r in enumerate(_WHEEL_RESIDUES) if b >> i & 1) for b in range(256))
+# Translation table from each byte to its number of set bits.
+_POPCOUNT = bytes(bin(b).count('1') for b in range(256))
+
+# Multiples of these primes are crossed off once, in a pattern that repeats every _PRESIEVE_PERIOD bytes of the
+# bitmap, and the pattern is copied into each sieve segment rather than sieving them one by one.
+_PRESIEVE_PRIMES = (7, 11, 13, 17)
+_PRESIEVE_PERIOD = 7*11*13*17
+
+def _presieve_pattern(r):
+    seg = bytearray(b'\x01')*_PRESIEVE_PERIOD
+    for p in _PRESIEVE_PRIMES:
+        k = -r*pow(30, -1, p) % p
+        seg[k::p] = bytes(len(range(k, _PRESIEVE_PERIOD, p)))
+    return bytes(seg)
+
+# For each wheel residue r, _PRESIEVE[i][k] is 0 if 30*k + r is a multiple of one of the _PRESIEVE_PRIMES.
+_PRESIEVE = tuple(_presieve_pattern(r) for r in _WHEEL_RESIDUES)
+
+def _sieve_segment(k0, k1, sieving):
+    """
+    Sieves the numbers 30*k + r, for k0 <= k < k1 and r in the wheel residues, and returns their bitmap bytes.
+    
+    Each segment starts from a copy of the pre-sieved pattern, so sieving holds (p, inverse of 30 modulo p) for
+    every prime from 19 up to (at least) sqrt(30*k1).
+    """
+    size = k1 - k0
+    # only the primes up to the square root of the segment's last number, compared once per segment
+    sieving = sieving[:bisect_left(sieving, (isqrt(30*k1 - 1) + 1,))]
+    offset = k0 % _PRESIEVE_PERIOD
+    reps = (offset + size)//_PRESIEVE_PERIOD + 1
+    bits = 0
+    for i, r in enumerate(_WHEEL_RESIDUES):
+        # seg[j] represents 30*(k0 + j) + r
+        seg = bytearray((_PRESIEVE[i]*reps)[offset:offset + size])
+        if k0 == 0:
+            seg[0] = (r != 1)  # 1 is not prime, but all the other residues are (including the pre-sieved primes)
+        for p, inv30 in sieving:
+            # first k >= k0 with 30*k + r a multiple of p, and no smaller than p*p
+            k_min = max(k0, (p*p - r + 29)//30)
+            k = k_min + (-r*inv30 - k_min) % p
+            seg[k - k0::p] = bytes(len(range(k - k0, size, p)))
+        # each byte of seg is 0 or 1, so shifting by i bits lands on bit i of each bitmap byte
+        bits |= int.from_bytes(seg, 'little') << i
+    return bits.to_bytes(size, 'little')
+
+# save() files: this header, then the wheel bitmap.  The header holds the magic bytes, the format version and the
+# number of integers the bitmap covers (30 per byte).
+_FILE_MAGIC = b'PPRM'
+_FILE_VERSION = 1
+_FILE_HEADER = struct.Struct('<4sIQ')
+
+def _iter_wheel(bits, k0=0, k1=None):
+    """
+    Iterates over the primes held in the wheel bitmap bits, from byte k0 up to (not including) byte k1.
+    
+    >>> list(_iter_wheel(bytes([0b11111110, 0b11011111])))
+    [7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59]
+    """
+    for k in range(k0, len(bits) if k1 is None else k1):
+        base = 30*k
+        for r in _BIT_POSITIONS[bits[k]]:
+            yield base + r
+
+def _sieve_wheel(upper):
+    """
+    Returns the wheel bitmap of all the primes <= upper (rounded up to a whole byte), sieved from scratch.
+    
+    >>> list(_iter_wheel(_sieve_wheel(100)))[-3:]
+    [107, 109, 113]
+    """
+    root = isqrt(upper)
+    sieving = []
+    if root > _PRESIEVE_PRIMES[-1]:
+        sieving = [(p, pow(30, -1, p)) for p in _iter_wheel(_sieve_wheel(root)) if p > _PRESIEVE_PRIMES[-1]]
+    return _sieve_segment(0, upper//30 + 1, sieving)
+
+# The primes below 2**16 (and the few more up to the end of the last byte), sieved once at import and shared by all
+# instances: enough to test any n < 2**32 without extending the bitmap.
+_SMALL_WHEEL = _sieve_wheel(2**16 - 1)
+_SMALL_PRIMES = tuple(chain((2, 3, 5), _iter_wheel(_SMALL_WHEEL)))
+
+# Number of consecutive primes multiplied together, for is_prime() to test n against them all with a single gcd.
+_PRODUCT_BLOCK = 1024
+
+def _trial_divide(n, primes):
+    """
+    Returns the first of primes that divides n, or 0 if none of them does.
+    
+    This is the inner loop of primality testing beyond the sieved range, kept as a plain function over a sequence of
+    ints so that it runs well under PyPy's JIT and can be swapped for a compiled (Cython/Numba) version in isolation:
+    the primes are passed as a slice of an array('Q'), which such a version can read directly as a C buffer.
+    
+    >>> _trial_divide(1000001, [2, 3, 5, 7, 11, 101, 103])
+    101
+    >>> _trial_divide(1000003, [2, 3, 5, 7, 11, 101, 103])
+    0
+    """
+    for p in primes:
+        if n%p == 0:
+            return p
+    return 0
+
+def _divide_out(n, p, factors):
+    """
+    Divides p out of n as many times as it goes, appending p to factors each time, and returns what is left.
+    
+    Each step is a single divmod(), rather than a modulo to test and a floor division to divide.
+    
+    >>> f = []
+    >>> _divide_out(2**5 * 3, 2, f), f
+    (3, [2, 2, 2, 2, 2])
+    """
+    q, r = divmod(n, p)
+    while r == 0:
+        factors.append(p)
+        n = q
+        q, r = divmod(n, p)
+    return n
+
+class _KnownPrimes(Set):
+    """
+    A read-only set view of the primes in a Prime's wheel bitmap.
+    
+    Nothing is stored per prime: membership is a bit test, len() a popcount, and next_after() scans for the next set
+    bit.
+    
+    >>> kp = Prime().known_primes
+    >>> 29 in kp, 30 in kp, 10**6 in kp
+    (True, False, False)
+    >>> len(kp)
+    6545
+    >>> kp.next_after(100), kp.next_after(2), kp.next_after(65543)
+    (101, 3, None)
+    >>> kp
+    <known primes: 6545 below 65550>
+    
+    Set operations give a plain set:
+    
+    >>> sorted(kp & {1, 2, 3, 4})
+    [2, 3]
+    >>> 1 in (kp | {1})
+    True
+    """
+    def __init__(self, prime):
+        self._prime = prime
+    
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+    
+    def __repr__(self):
+        return '<known primes: {:d} below {:d}>'.format(len(self), 30*len(self._prime._wheel_bits))
+    
+    def __contains__(self, n):
+        return isinstance(n, int) and 2 <= n < 30*len(self._prime._wheel_bits) and self._prime._in_wheel(n)
+    
+    def __iter__(self):
+        return chain((2, 3, 5), _iter_wheel(self._prime._wheel_bits))
+    
+    def __len__(self):
+        return 3 + sum(self._prime._wheel_bits.translate(_POPCOUNT))
+    
+    def next_after(self, n):
+        """
+        The smallest known prime greater than n, or None if there is none in the bitmap.
+        """
+        if n < 5:
+            return next(p for p in (2, 3, 5) if p > n)
+        bits = self._prime._wheel_bits
+        k = (n + 1)//30
+        if k >= len(bits):
+            return None
+        for r in _BIT_POSITIONS[bits[k]]:
+            if 30*k + r > n:
+                return 30*k + r
+        for k in range(k + 1, len(bits)):
+            if bits[k]:
+                return 30*k + _BIT_POSITIONS[bits[k]][0]
+        return None
 
 class Prime(object):
     """
-    We maintain two pieces of state: a list and a set.
-    The set (known_primes) contains all known primes, in no order and not necessarily contiguous.
-    These are used to do a look-up to short-circuit checks of primality.
-    The list (known_primes_contiguous) is used to check for numbers that are not yet known to be prime or composite.
+    We maintain one main piece of state: a bitmap.
+    The bitmap (_wheel_bits) holds the contiguous known primes, packed modulo 30: byte k has one bit for each of the
+    8 numbers 30*k + r that are coprime to 30, set if that number is prime.  2, 3 and 5 are implicit.
+    Every number below 30*len(_wheel_bits) is known to be either prime or composite, with a single bit test.
+    Beyond that, the results of is_prime() are remembered in an LRU cache.
+    The list (known_primes_contiguous) is a view of the bitmap, decoded lazily when it is accessed.
+    The array (_primes_arr) is an internal mirror of the same primes as unsigned 64-bit ints, for the sieve and trial
+    division to scan: it is only decoded as far as they need (roughly the square root of the largest number sieved
+    or tested), as 8 bytes a prime in one contiguous buffer.
+    The set (known_primes) is another view of the bitmap, for membership tests.
     """
+    # Bitmap bytes sieved at a time (each of the 8 per-residue segments is this many bytes long).
+    # 256 KiB segments fit a typical L2 cache; override on a subclass or instance to tune (e.g. 32 KiB for L1).
+    SIEVE_SEGMENT = 256*1024
+    # Number of is_prime() results beyond the bitmap to remember (least recently used are dropped first).
+    PRIME_CACHE_SIZE = 100000
+    
     def __init__(self):
-        self.__known_primes = set()
-        self.known_primes_contiguous = [2, 3, 5, 7, 11]
+        self._is_prime_cached = lru_cache(maxsize=self.PRIME_CACHE_SIZE)(self._is_prime_beyond_wheel)
+        self._reset_wheel(bytearray(_SMALL_WHEEL))
         self.lg = logging.getLogger(__name__)
         self.lg.info('Prime.__init__()')
         
     @property
     def known_primes(self):
-        return self.__known_primes
-    
-    @known_primes.setter
-    def known_primes(self, kp):
-        self.__known_primes = set(kp)
-        
-    def _add_known_prime(self, p):
-        if p not in self.__known_primes:
-            self.__known_primes = self.__known_primes.union({p})
+        """
+        The contiguous known primes as a read-only set, backed directly by the bitmap.
+        """
+        return _KnownPrimes(self)
     
     @property
     def known_primes_contiguous(self):
-        return self.__known_primes_contiguous
+        """
+        The contiguous known primes as a sorted list, decoded from the bitmap as far as it has grown.
+        
+        >>> Prime().known_primes_contiguous[:10]
+        [2, 3, 5, 7, 11, 13, 17, 19, 23, 29]
+        """
+        kpc = self.__known_primes_contiguous
+        kpc.extend(_iter_wheel(self._wheel_bits, self.__kpc_decoded))
+        self.__kpc_decoded = len(self._wheel_bits)
+        return kpc
     
     @known_primes_contiguous.setter
     def known_primes_contiguous(self, kpc):
-        self.__known_primes_contiguous = kpc
-        self.__known_primes = self.__known_primes.union(kpc)
+        """
+        Replaces the contiguous known primes with kpc, which must be all the primes from 2 up to kpc[-1], in order.
+        
+        Only the primes above 5 are packed into the bitmap (2, 3 and 5 are implicit), so kpc must start with them.
+        
+        >>> p = Prime()
+        >>> p.known_primes_contiguous = []
+        Traceback (most recent call last):
+        ...
+        ValueError: no primes given
+        >>> p.known_primes_contiguous = [3, 5, 7]
+        Traceback (most recent call last):
+        ...
+        ValueError: contiguous primes must start 2, 3, 5, not [3, 5, 7]
+        """
+        if len(kpc) == 0:
+            raise ValueError('no primes given')
+        if list(kpc[:3]) != [2, 3, 5]:
+            raise ValueError('contiguous primes must start 2, 3, 5, not {}'.format(list(kpc[:3])))
+        bits = bytearray(kpc[-1]//30)
+        for p in kpc[3:]:
+            k = p//30
+            if k >= len(bits):
+                break
+            bits[k] |= 1 << _RES_TO_BIT[p%30]
+        self._reset_wheel(bits)
+        # complete the last, partial byte
+        self._extend_to(kpc[-1])
+    
+    def _reset_wheel(self, bits):
+        """
+        Replaces the wheel bitmap with bits, discarding the decoded list view and array mirror.
         
+        A bitmap shorter than the shared small primes is replaced by them, as they hold everything it does.
+        """
+        if len(bits) < len(_SMALL_WHEEL):
+            bits = bytearray(_SMALL_WHEEL)
+        self._wheel_bits = bits
+        # __kpc_decoded and __arr_decoded are the numbers of bytes of _wheel_bits already decoded into
+        # known_primes_contiguous and _primes_arr: the shared small primes come already decoded
+        if bits[:len(_SMALL_WHEEL)] == _SMALL_WHEEL:
+            self.__known_primes_contiguous = list(_SMALL_PRIMES)
+            self._primes_arr = array('Q', _SMALL_PRIMES)
+            self.__kpc_decoded = self.__arr_decoded = len(_SMALL_WHEEL)
+        else:
+            self.__known_primes_contiguous = [2, 3, 5]
+            self._primes_arr = array('Q', (2, 3, 5))
+            self.__kpc_decoded = self.__arr_decoded = 0
+        self.__block_products = []
+    
+    def _block_products(self, num_blocks):
+        """
+        The products of (at least) the first num_blocks blocks of _PRODUCT_BLOCK contiguous known primes.
+        
+        These are computed once, as the blocks are first needed, and kept.  The blocks must already be decoded into
+        _primes_arr.
+        """
+        products = self.__block_products
+        kpc = self._primes_arr
+        for i in range(len(products), num_blocks):
+            products.append(prod(kpc[i*_PRODUCT_BLOCK:(i + 1)*_PRODUCT_BLOCK]))
+        return products
+    
+    def _in_wheel(self, n):
+        """
+        Whether n is prime, for 0 <= n < 30*len(_wheel_bits).
+        """
+        bit = _RES_TO_BIT.get(n%30)
+        if bit is None:
+            return n in (2, 3, 5)
+        return bool(self._wheel_bits[n//30] >> bit & 1)
 
     def iter_primes(self, max_value=None, max_num=None, start_num=None):
         """
-        Iterates over *all* prime numbers, utilising the known_primes first.
+        Iterates over *all* prime numbers, utilising the contiguous known primes first.
         
-        Together with is_prime() this is recursive.
+        The contiguous known primes are extended in bulk by _extend_to() as needed.
         
         >>> p = Prime()
         >>> [i for i in p.iter_primes(10)]
@@ -56,35 +332,97 @@ class Prime(object):
         
         >>> [i for i in p.iter_primes(max_num=10, start_num=7)]
         [19, 23, 29]
+        
+        The bitmap only grows as the iteration gets there:
+        
+        >>> next(p.iter_primes(10**12))
+        2
+        >>> len(p._wheel_bits) == len(_SMALL_WHEEL)
+        True
         """
         ii = start_num or 0
         if ii > len(self.known_primes_contiguous):
             raise NotImplementedError('cannot start beyond contiguous known primes (currently {:d} of them)'.format(
             len(self.known_primes_contiguous)))
-            
-        def _finished(c, ii=None):
-            return ((max_value is not None) and (c > max_value) or 
-                    ((max_num is not None) and (ii is not None) and (ii >= max_num)))
-        c = 1
-        while not _finished(c, ii):
-            while ii+1 > len(self.known_primes_contiguous):
-                c = self.known_primes_contiguous[-1] + 2
-                if _finished(c):
-                    return
-                while not self.is_prime(c):
-                    c += 2
-                    if _finished(c):
+        
+        kpc = self.known_primes_contiguous
+        while (max_num is None) or (ii < max_num):
+            if ii >= len(kpc):
+                # every prime below lo has been yielded: double the bitmap, but not beyond max_value
+                lo = 30*len(self._wheel_bits)
+                upper = 2*lo
+                if max_value is not None:
+                    if lo > max_value:
                         return
-                self.known_primes_contiguous += [c]
-            next_p = self.known_primes_contiguous[ii]
-            if _finished(next_p):
+                    upper = min(upper, int(max_value))
+                self._extend_to(upper)
+                kpc = self.known_primes_contiguous
+            next_p = kpc[ii]
+            if (max_value is not None) and (next_p > max_value):
                 return
             ii += 1
             yield next_p
     
+    def _extend_to(self, upper):
+        """
+        Extends the contiguous known primes to include every prime <= upper.
+        
+        This is a Sieve of Eratosthenes over the segment between the end of the bitmap and upper (rounded up to a
+        whole byte of the bitmap), holding only the candidates coprime to 30, with one segment per wheel residue: this
+        skips the 22 in every 30 numbers that are multiples of 2, 3 or 5.  The range is sieved in blocks of
+        SIEVE_SEGMENT bitmap bytes, so that the segment being crossed off stays in the CPU cache.  The sieving primes
+        (those <= sqrt(upper)) are obtained first, if necessary, by extending to sqrt(upper).
+        
+        >>> p = Prime()
+        >>> p._extend_to(100000)
+        >>> p.known_primes_contiguous[-4:]
+        [99989, 99991, 100003, 100019]
+        """
+        lo = 30*len(self._wheel_bits)
+        if upper < lo:
+            return
+        root = isqrt(upper)
+        if root >= 7 and root >= lo:
+            self._extend_to(root)
+            lo = 30*len(self._wheel_bits)
+            if upper < lo:
+                return
+        kpc = self._primes_scan(root)
+        
+        sieving = [(p, pow(30, -1, p)) for p in kpc[7:bisect_right(kpc, root)]]
+        k_end = upper//30 + 1
+        for k0 in range(lo//30, k_end, self.SIEVE_SEGMENT):
+            self._wheel_bits += _sieve_segment(k0, min(k0 + self.SIEVE_SEGMENT, k_end), sieving)
+    
+    def _primes_up_to(self, bound):
+        """
+        Extends the contiguous known primes to include every prime <= bound, and returns them.
+        
+        This is the _primes_arr mirror itself, so it may run beyond bound: callers bisect for the end they need and
+        iterate over the array directly, rather than through the iter_primes() generator.
+        
+        >>> p = Prime()
+        >>> kpc = p._primes_up_to(100000)
+        >>> kpc[bisect_right(kpc, 100000) - 1]
+        99991
+        """
+        self._extend_to(bound)
+        return self._primes_scan(bound)
+    
+    def _primes_scan(self, bound):
+        """
+        Returns the _primes_arr mirror, after decoding it from the bitmap to include every known prime <= bound.
+        """
+        k1 = min(len(self._wheel_bits), bound//30 + 1)
+        if k1 > self.__arr_decoded:
+            self._primes_arr.extend(_iter_wheel(self._wheel_bits, self.__arr_decoded, k1))
+            self.__arr_decoded = k1
+        return self._primes_arr
+    
     def is_prime(self, n):
         """
-        Beyond known_primes, this and iter_primes form a recursive group.
+        Within the contiguous known primes this is a single bit test.  Beyond them, it is trial division by the
+        contiguous primes up to sqrt(n), extending them as needed: see _is_prime_beyond_wheel().
         
         >>> p = Prime()
         >>> p.is_prime(119)
@@ -95,29 +433,84 @@ class Prime(object):
         True
         >>> p.is_prime(1021)
         True
+        >>> p.is_prime(1)
+        False
+        >>> p.is_prime(1000001)
+        False
+        >>> p.is_prime(1000003)
+        True
+        >>> p.is_prime(1000003*1000033)
+        False
+        >>> p.is_prime(1000000000039)
+        True
+        >>> p.is_prime(1000000000039)
+        True
+        >>> p._is_prime_cached.cache_info().hits
+        1
         
         """
-        rv = None
+        if n < 2:
+            return False
+        if n < 30*len(self._wheel_bits):
+            return self._in_wheel(n)
+        return self._is_prime_cached(n)
+    
+    def _is_prime_beyond_wheel(self, n):
+        """
+        The trial division for is_prime(), for n beyond the bitmap.  Results are memoised in _is_prime_cached().
         
-        if n in self.known_primes:
-            rv = True
-        else:
-            for p in self.iter_primes():
-                if n%p == 0:
-                    self.lg.info('found prime factor: {:d}'.format(p))
-                    rv = False
-                    break
-                if p**2 > n:
-                    self.lg.debug('p**2>n')
-                    self._add_known_prime(n)
-                    rv = True
-                    break   
+        n is first tested against the primes already known, and the bitmap is only extended towards sqrt(n), one
+        sieve segment at a time, while none of them divides n.  So a large n with a small factor costs no sieving.
         
-        return rv
+        >>> p = Prime()
+        >>> p.is_prime(2*10**16), p.is_prime(3**37)
+        (False, False)
+        >>> len(p._wheel_bits) == len(_SMALL_WHEEL)
+        True
+        """
+        sn = isqrt(n)
+        start = 0
+        while True:
+            kpc = self._primes_scan(sn)
+            stop = bisect_right(kpc, sn)
+            p = self._find_factor(n, start, stop)
+            if p:
+                self.lg.info('found prime factor: {:d}'.format(p))
+                return False
+            lo = 30*len(self._wheel_bits)
+            if sn < lo:
+                return True
+            self._extend_to(min(sn, lo + 30*self.SIEVE_SEGMENT - 1))
+            start = stop
+    
+    def _find_factor(self, n, start, stop):
+        """
+        Returns the first of the known primes _primes_arr[start:stop] that divides n, or 0 if none of them does.
+        
+        Whole blocks of primes are tested at once, by taking the gcd of n with the product of the block, and only a
+        block that shares a factor with n is searched prime by prime.
+        """
+        kpc = self._primes_arr
+        first = -(-start//_PRODUCT_BLOCK)  # the first whole block at or after start
+        last = stop//_PRODUCT_BLOCK
+        if first >= last:
+            return _trial_divide(n, kpc[start:stop])
+        p = _trial_divide(n, kpc[start:first*_PRODUCT_BLOCK])
+        if p:
+            return p
+        products = self._block_products(last)
+        for i in range(first, last):
+            if gcd(n, products[i]) > 1:
+                return _trial_divide(n, kpc[i*_PRODUCT_BLOCK:(i + 1)*_PRODUCT_BLOCK])
+        return _trial_divide(n, kpc[last*_PRODUCT_BLOCK:stop])
     
     def prime_factors(self, n):
         """
-        Recursive.
+        Iterative trial division: first by the shared small primes (those below 2**16), then by the contiguous known
+        primes beyond them, up to the square root of whatever is left to factorise.
+        
+        As in _is_prime_beyond_wheel(), the primes already known are tried first, and the bitmap is only extended one
+        sieve segment at a time, bounded by the square root of the cofactor left at that point.
         
         >>> p = Prime()
         >>> p.prime_factors(9)
@@ -130,52 +523,164 @@ class Prime(object):
         [53]
         >>> p.prime_factors(1021)
         [1021]
+        >>> p.prime_factors(2**5 * 227**2 * 1009)
+        [2, 2, 2, 2, 2, 227, 227, 1009]
+        >>> p.prime_factors(70001**2 * 70003)
+        [70001, 70001, 70003]
+        >>> p.prime_factors(70001 * 70003 * 70009 * 70019)
+        [70001, 70003, 70009, 70019]
+        >>> len(p._wheel_bits) <= len(_SMALL_WHEEL) + p.SIEVE_SEGMENT
+        True
         """
+        if n < 2:
+            return [n]
         f = []
-        for p in self.iter_primes(n**(1/2)):
-            if n%p == 0:
-                f += [p]
-                f += self.prime_factors(n//p)
+        sn = isqrt(n)
+        for p in _SMALL_PRIMES:
+            if p > sn:
                 break
-        if len(f) == 0:
-            f += [n]
+            if n%p == 0:
+                n = _divide_out(n, p, f)
+                sn = isqrt(n)
+        else:
+            start = len(_SMALL_PRIMES)
+            while True:
+                kpc = self._primes_scan(sn)
+                stop = bisect_right(kpc, sn)
+                p = self._find_factor(n, start, stop) if start < stop else 0
+                if p:
+                    n = _divide_out(n, p, f)
+                    sn = isqrt(n)
+                    start = bisect_right(kpc, p, start, stop)
+                    continue
+                lo = 30*len(self._wheel_bits)
+                if sn < lo:
+                    break
+                self._extend_to(min(sn, lo + 30*self.SIEVE_SEGMENT - 1))
+                start = stop
+        if n > 1:
+            f.append(n)
         return f
     
     def are_prime(self, candidates):
         """
+        Whether all of candidates are prime, stopping at the first that is not.
+        
+        Each candidate goes through is_prime(), which only extends the contiguous primes as far as that candidate
+        needs, so a composite early in candidates settles the answer without sieving for the later ones.
+        
         >>> p = Prime()
         >>> p.are_prime([2, 3, 5])
         True
         >>> p.are_prime([2, 3, 5, 6])
         False
+        >>> p.are_prime(iter([1000003, 1000033, 1000037]))
+        True
+        >>> q = Prime()
+        >>> q.are_prime([4, 10**24 + 7])
+        False
+        >>> len(q._wheel_bits) == len(_SMALL_WHEEL)
+        True
+        
+        """
+        return all(map(self.is_prime, candidates))
         
+    def load(self, fname=None, verify=1000, load_smaller=False):
         """
-        found = False
-        for c in candidates:
-            if not self.is_prime(c):
-                found = True
-        return not found
+        Loads the contiguous known primes from a file written by save().
         
-    def load(self, fname='known_primes_contiguous.txt', verify=1000, load_smaller=False):
-        kpc = []
+        Files in the older text format (one prime per line) are recognised and handed to load_text().  If no fname is
+        given, this is known_primes_contiguous.bin, or the older known_primes_contiguous.txt when that is missing.
+        """
+        if fname is None:
+            try:
+                return self.load('known_primes_contiguous.bin', verify=verify, load_smaller=load_smaller)
+            except FileNotFoundError:
+                return self.load_text(verify=verify, load_smaller=load_smaller)
+        with open(fname, 'rb') as f:
+            header = f.read(_FILE_HEADER.size)
+            if len(header) < _FILE_HEADER.size or header[:len(_FILE_MAGIC)] != _FILE_MAGIC:
+                return self.load_text(fname, verify=verify, load_smaller=load_smaller)
+            _, version, limit = _FILE_HEADER.unpack(header)
+            if version != _FILE_VERSION:
+                raise ValueError('unsupported file version {:d}'.format(version))
+            bits = bytearray(f.read())
+        if limit != 30*len(bits):
+            raise ValueError('file header says {:d} numbers are covered, but found {:d}'.format(limit, 30*len(bits)))
+        if verify and not self.are_prime(islice(chain((2, 3, 5), _iter_wheel(bits)), verify)):
+            raise ValueError('first {:d} loaded numbers are not prime'.format(verify))
+        # the shared small primes every instance starts with don't count as already having primes
+        if len(self._wheel_bits) > max(len(bits), len(_SMALL_WHEEL)):
+            if not load_smaller:
+                raise ValueError('primes below {:d} loaded, but already have primes below {:d}'.format(
+                    30*len(bits),
+                    30*len(self._wheel_bits)))
+        self._reset_wheel(bits)
+    
+    def load_text(self, fname='known_primes_contiguous.txt', verify=1000, load_smaller=False):
+        """
+        Loads the contiguous known primes from a text file with one prime per line.
+        
+        The file is parsed line by line by map() straight into an array('Q'), so neither the whole text nor a list
+        of lines or of ints is held in memory.
+        
+        >>> import os, tempfile
+        >>> p = Prime()
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     fname = os.path.join(d, 'primes.txt')
+        ...     with open(fname, 'w') as f:
+        ...         for q in Prime().iter_primes(100000):
+        ...             print(q, file=f)
+        ...     p.load_text(fname)
+        >>> p.known_primes_contiguous[-1]
+        100019
+        
+        A file with fewer primes than every instance starts with is merged into them:
+        
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     fname = os.path.join(d, 'small.txt')
+        ...     with open(fname, 'w') as f:
+        ...         for q in (2, 3, 5, 7, 11):
+        ...             print(q, file=f)
+        ...     p = Prime()
+        ...     p.load_text(fname)
+        >>> p.known_primes_contiguous == list(_SMALL_PRIMES)
+        True
+        """
         with open(fname, 'rt') as f:
-            kpc = [int(i) for i in f.readlines()]
+            kpc = array('Q', map(int, f))
         if verify and not self.are_prime(kpc[0:verify]):
-            raise ValueError('first {:d} loaded numbers are not prime'.format(verify_num))
-        if len(self.known_primes_contiguous) > len(kpc):
+            raise ValueError('first {:d} loaded numbers are not prime'.format(verify))
+        # the shared small primes every instance starts with don't count as already having primes
+        if len(self._wheel_bits) > len(_SMALL_WHEEL) and len(self.known_primes) > len(kpc):
             if not load_smaller:
                 raise ValueError('{:d} primes loaded, but already have {:d}'.format(
                     len(kpc),
-                    len(self.known_primes_contiguous)))
-        self.__known_primes = set()
+                    len(self.known_primes)))
         self.known_primes_contiguous = kpc
 
     def save(self, fname=None, overwrite=False):
+        """
+        Saves the contiguous known primes as a header followed by the raw wheel bitmap.
+        
+        >>> import os, tempfile
+        >>> p = Prime()
+        >>> p._extend_to(100000)
+        >>> q = Prime()
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     fname = os.path.join(d, 'primes.bin')
+        ...     p.save(fname)
+        ...     q.load(fname)
+        3350
+        >>> q.known_primes_contiguous == p.known_primes_contiguous
+        True
+        """
         if fname is None:
-            fname = 'known_primes_contiguous.txt'
+            fname = 'known_primes_contiguous.bin'
         bytes_written = None
-        with open(fname, 'w' if overwrite else 'x') as f:
-            bytes_written = f.write('\n'.join([str(p) for p in self.known_primes_contiguous]))
+        with open(fname, 'wb' if overwrite else 'xb') as f:
+            bytes_written = f.write(_FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, 30*len(self._wheel_bits)))
+            bytes_written += f.write(self._wheel_bits)
         return bytes_written
     
 if __name__ == '__main__':